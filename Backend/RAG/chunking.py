@@ -1,17 +1,13 @@
+import numpy as np
 import tiktoken
 
+_ENCODING = tiktoken.get_encoding("cl100k_base")
+
 
 def chunk_text(text: str, max_chunk_size: int = 500, overlap_size: int = 80) -> list:
     """Split text into overlapping chunks by token count."""
-    encoding = tiktoken.get_encoding("cl100k_base")
-    tokens = encoding.encode(text)
-    
-    chunks = []
-    start = 0
-    
-    while start < len(tokens):
-        end = min(start + max_chunk_size, len(tokens))
-        chunks.append(encoding.decode(tokens[start:end]))
-        start += max_chunk_size - overlap_size
+    tokens = _ENCODING.encode_ordinary(text)  # Skip the special-token scan
     
-    return chunks
\ No newline at end of file
+    starts = np.arange(0, len(tokens), max_chunk_size - overlap_size)
+    windows = [tokens[start:start + max_chunk_size] for start in starts]
+    return _ENCODING.decode_batch(windows)  # Decodes all windows in one threaded call
\ No newline at end of file
@@ -1,9 +1,71 @@
+import asyncio
+import glob
+import math
+import os
+import shutil
+
 import numpy as np
 import faiss
+import torch
+from huggingface_hub import file_exists
 from sentence_transformers import SentenceTransformer
 
 _embedding_models = {}  # Cache for loaded models
 
+torch.set_num_threads(os.cpu_count() or 1)
+try:
+    torch.set_num_interop_threads(2)
+except RuntimeError:
+    pass  # Already fixed once any parallel work has run
+
+HNSW_M = 32  # Graph neighbours per node
+HNSW_EF_CONSTRUCTION = 100
+IVF_MIN_VECTORS = 1000  # Switch to quantized IVF above this corpus size
+EMBED_BATCH_SIZE = 64
+QUERY_BATCH_MAX = 32  # Max concurrent queries folded into one encode call
+QUERY_BATCH_DELAY = 0.015  # Seconds to wait for more queries after the first
+ONNX_CACHE_DIR = os.path.join("models", "onnx")  # Exports for models that ship no ONNX graph
+
+_query_queue = None
+_query_worker = None
+
+
+def _get_device() -> str:
+    """Pick the fastest available torch device."""
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def _ships_onnx(model_name: str) -> bool:
+    """Check whether a model already provides an ONNX graph, locally or on the Hub."""
+    if os.path.isdir(model_name):
+        return bool(glob.glob(os.path.join(model_name, "**", "*.onnx"), recursive=True))
+    try:
+        return file_exists(model_name, "onnx/model.onnx")
+    except Exception:
+        return False  # Unreachable Hub: treat as an export so it gets cached
+
+
+def _load_onnx_model(model_name: str) -> SentenceTransformer:
+    """Load a model on ONNX Runtime, exporting it at most once per model name."""
+    export_path = os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "--"))
+    if os.path.isdir(export_path):
+        return SentenceTransformer(export_path, device="cpu", backend="onnx")
+    
+    model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+    if not _ships_onnx(model_name):
+        # Save beside the final path and rename, so an interrupted save never looks like a valid cache
+        tmp_path = f"{export_path}.tmp-{os.getpid()}"
+        model.save_pretrained(tmp_path)
+        try:
+            os.replace(tmp_path, export_path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)  # Another process cached it first
+    return model
+
 
 def get_embedding_model(model_name: str):
     """Load and cache embedding model."""
@@ -11,7 +73,13 @@ def get_embedding_model(model_name: str):
         raise ValueError("Embedding model name is required")
     
     if model_name not in _embedding_models:
-        _embedding_models[model_name] = SentenceTransformer(model_name)
+        device = _get_device()
+        if device == "cpu":
+            model = _load_onnx_model(model_name)
+        else:
+            model = SentenceTransformer(model_name, device=device)
+            model.half()  # fp16 halves memory traffic on GPU
+        _embedding_models[model_name] = model
     
     return _embedding_models[model_name]
 
@@ -22,6 +90,92 @@ def embed_texts(texts: list, model_name: str) -> np.ndarray:
         raise ValueError("Embedding model name is required")
     
     model = get_embedding_model(model_name)
-    vectors = model.encode(texts, convert_to_numpy=True).astype("float32")
-    faiss.normalize_L2(vectors)
-    return vectors
\ No newline at end of file
+    # encode() sorts inputs by length before batching, which keeps padding per batch minimal
+    with torch.inference_mode():
+        vectors = model.encode(
+            texts, batch_size=EMBED_BATCH_SIZE, show_progress_bar=False,
+            convert_to_numpy=True, normalize_embeddings=True
+        ).astype("float32", copy=False)  # No-op copy unless the model ran in fp16
+    return vectors
+
+
+async def embed_query(query: str, model_name: str) -> np.ndarray:
+    """Embed one query, batched with any other queries arriving concurrently."""
+    global _query_queue, _query_worker
+    loop = asyncio.get_running_loop()
+    if _query_worker is None or _query_worker.done() or _query_worker.get_loop() is not loop:
+        _query_queue = asyncio.Queue()
+        _query_worker = loop.create_task(_drain_queries(_query_queue))
+    
+    future = loop.create_future()
+    await _query_queue.put((query, model_name, future))
+    return await future
+
+
+async def _drain_queries(queue: asyncio.Queue):
+    """Collect queued queries for a short window and encode them together."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + QUERY_BATCH_DELAY
+        while len(batch) < QUERY_BATCH_MAX:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        by_model = {}
+        for item in batch:
+            by_model.setdefault(item[1], []).append(item)
+        
+        for model_name, items in by_model.items():
+            try:
+                vectors = await asyncio.to_thread(embed_texts, [query for query, _, _ in items], model_name)
+            except Exception as e:
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future), vector in zip(items, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+
+def build_index(vectors: np.ndarray):
+    """Build an inner-product FAISS index sized to the corpus."""
+    n, d = vectors.shape
+    if n >= IVF_MIN_VECTORS:
+        nlist = max(int(2 * math.sqrt(n)), 20)
+        index = faiss.index_factory(d, f"IVF{nlist},SQ8", faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)  # Learns both the coarse centroids and the SQ8 ranges
+        index.nprobe = min(nlist // 4, 10)
+    else:
+        index = faiss.IndexHNSWFlat(d, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.add(vectors)
+    return index
+
+
+def save_chunks(chunks: list, path: str):
+    """Write chunks as one length-prefixed UTF-8 blob: count, byte lengths, then the texts."""
+    encoded = [chunk.encode("utf-8") for chunk in chunks]
+    lengths = np.array([len(data) for data in encoded], dtype="<u8")
+    with open(path, "wb") as f:
+        f.write(np.array([len(encoded)], dtype="<u8").tobytes())
+        f.write(lengths.tobytes())
+        f.write(b"".join(encoded))
+
+
+def load_chunks(path: str) -> list:
+    """Read chunks written by save_chunks."""
+    with open(path, "rb") as f:
+        data = f.read()
+    count = int(np.frombuffer(data, dtype="<u8", count=1)[0])
+    lengths = np.frombuffer(data, dtype="<u8", count=count, offset=8)
+    ends = np.cumsum(lengths) + 8 * (count + 1)
+    starts = ends - lengths
+    view = memoryview(data)
+    return [str(view[start:end], "utf-8") for start, end in zip(starts.tolist(), ends.tolist())]
\ No newline at end of file
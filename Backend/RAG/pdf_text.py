@@ -1,8 +1,78 @@
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 from pypdf import PdfReader
 
+PARALLEL_MIN_PAGES = 32  # Below this, worker startup costs more than it saves
+_WHITESPACE = re.compile(r"\s+")
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _submit_ranges(file_path: str, starts: range, stops: list):
+    """Queue page ranges on the shared pool, growing it only when a PDF needs more workers."""
+    global _pool, _pool_workers
+    workers = len(starts)
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)  # Work already submitted still completes
+            # spawn, not fork: callers run in threads alongside torch/ONNX Runtime pools
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        # map() submits eagerly, so holding the lock keeps another caller from shutting the pool down mid-submit
+        pool = _pool
+        try:
+            return pool, pool.map(_extract_page_range, [file_path] * workers, starts, stops)
+        except BrokenProcessPool:
+            _pool, _pool_workers = None, 0
+            pool.shutdown(wait=False)
+            raise
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next call starts a fresh one."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_workers = None, 0
+    pool.shutdown(wait=False)
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> str:
+    """Extract text from pages [start, stop) of a PDF."""
+    reader = PdfReader(file_path)
+    return " ".join(reader.pages[i].extract_text() or "" for i in range(start, stop))
+
 
 def extract_text_from_pdf(file_path: str) -> str:
     """Extract and clean text from a PDF file."""
     reader = PdfReader(file_path)
-    text = " ".join(page.extract_text() or "" for page in reader.pages)
-    return " ".join(text.split())  # Normalize whitespace
\ No newline at end of file
+    num_pages = len(reader.pages)
+    workers = min(os.cpu_count() or 1, num_pages // PARALLEL_MIN_PAGES)
+    
+    if workers < 2:
+        text = " ".join(page.extract_text() or "" for page in reader.pages)
+    else:
+        step = -(-num_pages // workers)
+        starts = range(0, num_pages, step)
+        stops = [min(start + step, num_pages) for start in starts]
+        for attempt in range(2):
+            pool = None
+            try:
+                pool, parts = _submit_ranges(file_path, starts, stops)
+                text = " ".join(parts)
+                break
+            except BrokenProcessPool:
+                # A worker died (OOM kill, segfault); retry once in case an earlier PDF broke the pool
+                if pool is not None:
+                    _discard_pool(pool)
+                if attempt:
+                    raise
+    return _WHITESPACE.sub(" ", text).strip()  # Normalize whitespace
\ No newline at end of file
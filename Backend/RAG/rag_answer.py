@@ -1,20 +1,51 @@
-from RAG.embed_store import embed_texts
+import asyncio
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterator
+
+import faiss
+import numpy as np
+
+from RAG.embed_store import embed_query
 from huggingface_hub import InferenceClient
 from openai import OpenAI
 
 
-def retrieve(query: str, index, chunks: list, top_k: int = 5, embedding_model: str = None) -> list:
+QUERY_CACHE_SIZE = 1024
+CLIENT_CACHE_SIZE = 16  # Bounds pooled connections and API keys held in memory
+
+_query_cache = OrderedDict()  # LRU of (query, model_name) -> vector bytes
+
+
+async def _embed_query(query: str, model_name: str) -> bytes:
+    """Embed a single query, cached so repeated prompts skip the model."""
+    key = (query, model_name)
+    if key in _query_cache:
+        _query_cache.move_to_end(key)
+        return _query_cache[key]
+    
+    vector = (await embed_query(query, model_name)).tobytes()
+    _query_cache[key] = vector
+    if len(_query_cache) > QUERY_CACHE_SIZE:
+        _query_cache.popitem(last=False)
+    return vector
+
+
+async def retrieve(query: str, index, chunks: np.ndarray, top_k: int = 5, embedding_model: str = None) -> list:
     """Retrieve top-k relevant chunks for a query."""
     if not embedding_model:
         raise ValueError("Embedding model is required for retrieval")
     
-    qvector = embed_texts([query], model_name=embedding_model)
-    _, indices = index.search(qvector, top_k)
-    return [chunks[i] for i in indices[0] if i != -1]
+    qvector = np.frombuffer(await _embed_query(query, embedding_model), dtype="float32").reshape(1, -1)
+    # Per-call params rather than mutating index.hnsw, since searches now run concurrently
+    params = faiss.SearchParametersHNSW(efSearch=max(64, top_k * 8)) if hasattr(index, "hnsw") else None
+    _, indices = await asyncio.to_thread(index.search, qvector, top_k, params=params)
+    hits = indices[0]
+    return chunks[hits[hits >= 0]].tolist()  # FAISS pads missing results with -1
 
 
-def generate_answer(query: str, ctx: list, provider: str, llm_model: str, api_key: str) -> str:
-    """Generate answer using specified LLM provider."""
+def generate_answer(query: str, ctx: list, provider: str, llm_model: str, api_key: str) -> Iterator[str]:
+    """Stream answer text from the specified LLM provider as it is generated."""
     if not provider or provider not in ["huggingface", "openai"]:
         raise ValueError("Provider must be 'huggingface' or 'openai'")
     if not llm_model:
@@ -28,8 +59,9 @@ def generate_answer(query: str, ctx: list, provider: str, llm_model: str, api_ke
     
     try:
         if provider == "openai":
-            return _generate_openai(system_prompt, user_prompt, llm_model, api_key)
-        return _generate_huggingface(system_prompt, user_prompt, llm_model, api_key)
+            yield from _generate_openai(system_prompt, user_prompt, llm_model, api_key)
+        else:
+            yield from _generate_huggingface(system_prompt, user_prompt, llm_model, api_key)
     except Exception as e:
         error_msg = str(e).lower()
         if "rate limit" in error_msg:
@@ -39,25 +71,39 @@ def generate_answer(query: str, ctx: list, provider: str, llm_model: str, api_ke
         raise Exception(f"Failed to generate answer: {e}")
 
 
-def _generate_huggingface(system_prompt: str, user_prompt: str, model: str, api_key: str) -> str:
+@lru_cache(maxsize=CLIENT_CACHE_SIZE)
+def _get_client(provider: str, api_key: str):
+    """Return a provider client, reused per API key so connections stay warm."""
+    if provider == "openai":
+        return OpenAI(api_key=api_key)
+    return InferenceClient(token=api_key)
+
+
+def _generate_huggingface(system_prompt: str, user_prompt: str, model: str, api_key: str) -> Iterator[str]:
     """Generate using HuggingFace Inference API."""
-    client = InferenceClient(token=api_key)
+    client = _get_client("huggingface", api_key)
     response = client.chat_completion(
         model=model,
         messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
         max_tokens=500,
-        temperature=0.2
+        temperature=0.2,
+        stream=True
     )
-    return response.choices[0].message.content.strip()
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
 
-def _generate_openai(system_prompt: str, user_prompt: str, model: str, api_key: str) -> str:
+def _generate_openai(system_prompt: str, user_prompt: str, model: str, api_key: str) -> Iterator[str]:
     """Generate using OpenAI API."""
-    client = OpenAI(api_key=api_key)
+    client = _get_client("openai", api_key)
     response = client.chat.completions.create(
         model=model,
         messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
         max_tokens=500,
-        temperature=0.2
+        temperature=0.2,
+        stream=True
     )
-    return response.choices[0].message.content.strip()
\ No newline at end of file
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
\ No newline at end of file
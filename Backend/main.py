@@ -1,17 +1,21 @@
 import os
-import shutil
+import asyncio
 import uuid
 import json
 import faiss
+import numpy as np
+import aiofiles
+from cachetools import LRUCache
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 
 from RAG.pdf_text import extract_text_from_pdf
 from RAG.chunking import chunk_text
-from RAG.embed_store import embed_texts
+from RAG.embed_store import embed_texts, build_index, save_chunks, load_chunks
 from RAG.rag_answer import retrieve, generate_answer
 
 app = FastAPI(title="RAG API", description="PDF upload and RAG-based chat API", version="2.0.0")
@@ -26,10 +30,15 @@ app.add_middleware(
 
 UPLOAD_DIR = "uploads"
 INDEX_DIR = "indexes"
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MB reads when saving uploads
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(INDEX_DIR, exist_ok=True)
 
-documents_store = {}  # In-memory document cache
+MAX_LOADED_DOCUMENTS = 32
+
+documents_store = {}  # Document registry: filename, paths and counts only
+loaded_documents = LRUCache(maxsize=MAX_LOADED_DOCUMENTS)  # Chunks and FAISS index; evicted entries reload from disk
+_load_locks = {}  # document_id -> asyncio.Lock, held only while a disk load is in flight
 
 
 # Request/Response Models
@@ -42,13 +51,6 @@ class ChatRequest(BaseModel):
     api_key: str
 
 
-class ChatResponse(BaseModel):
-    answer: str
-    sources: list[str]
-    model_used: str
-    provider: str
-
-
 class UploadResponse(BaseModel):
     document_id: str
     filename: str
@@ -109,37 +111,44 @@ async def upload_pdf(file: UploadFile = File(...), embedding_model: str = Form(.
     file_path = os.path.join(UPLOAD_DIR, f"{document_id}.pdf")
     
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await buffer.write(chunk)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
     
     try:
-        text = extract_text_from_pdf(file_path)
+        text = await asyncio.to_thread(extract_text_from_pdf, file_path)
         if not text.strip():
             raise HTTPException(status_code=400, detail="Could not extract text from PDF")
         
-        chunks = chunk_text(text)
+        chunks = await asyncio.to_thread(chunk_text, text)
         if not chunks:
             raise HTTPException(status_code=400, detail="Could not create chunks from PDF")
         
         index_path = os.path.join(INDEX_DIR, f"{document_id}.index")
         meta_path = os.path.join(INDEX_DIR, f"{document_id}_meta.json")
+        chunks_path = os.path.join(INDEX_DIR, f"{document_id}_chunks.bin")
         
-        vectors = embed_texts(chunks, model_name=embed_model)
-        index = faiss.IndexFlatIP(vectors.shape[1])
-        index.add(vectors)
+        vectors = await asyncio.to_thread(embed_texts, chunks, model_name=embed_model)
+        index = await asyncio.to_thread(build_index, vectors)
         
-        faiss.write_index(index, index_path)
+        await asyncio.to_thread(faiss.write_index, index, index_path)
         with open(meta_path, 'w', encoding='utf-8') as f:
-            json.dump({"chunks": chunks, "embedding_model": embed_model}, f)
+            json.dump({"embedding_model": embed_model}, f)
+        await asyncio.to_thread(save_chunks, chunks, chunks_path)
         
         documents_store[document_id] = {
             "filename": file.filename,
             "file_path": file_path,
             "index_path": index_path,
             "meta_path": meta_path,
-            "chunks": chunks,
+            "chunks_path": chunks_path,
+            "num_chunks": len(chunks),
+            "embedding_model": embed_model
+        }
+        loaded_documents[document_id] = {
+            "chunks": np.asarray(chunks, dtype=object),  # Lets retrieve() fancy-index hits
             "index": index,
             "embedding_model": embed_model
         }
@@ -159,48 +168,119 @@ async def upload_pdf(file: UploadFile = File(...), embedding_model: str = Form(.
         raise HTTPException(status_code=500, detail=f"Failed to process PDF: {e}")
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Chat with uploaded document using RAG."""
-    if not request.query.strip():
-        raise HTTPException(status_code=400, detail="Query cannot be empty")
-    if not request.provider or request.provider not in ["huggingface", "openai"]:
-        raise HTTPException(status_code=400, detail="Provider must be 'huggingface' or 'openai'")
-    if not request.llm_model or not request.llm_model.strip():
-        raise HTTPException(status_code=400, detail="LLM model is required")
-    if not request.api_key or not request.api_key.strip():
-        raise HTTPException(status_code=400, detail="API key is required")
+def _sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream_chat(sources: list, first_token: Optional[str], tokens, model_used: str, provider: str):
+    """Yield sources, then answer tokens, then a closing done (or error) event."""
+    yield _sse_event("sources", {"sources": sources})
+    try:
+        if first_token is not None:
+            yield _sse_event("token", {"text": first_token})
+        for token in tokens:
+            yield _sse_event("token", {"text": token})
+    except Exception as e:
+        yield _sse_event("error", {"detail": f"Failed to generate response: {e}"})
+        return
+    yield _sse_event("done", {"model_used": model_used, "provider": provider})
+
+
+def _read_index(index_path: str):
+    """Read a FAISS index, memory-mapping IVF inverted lists where the platform supports it."""
+    # IO_FLAG_MMAP only maps IVF inverted lists; HNSW indexes (< IVF_MIN_VECTORS chunks) are still read fully.
+    # The mmap loader is POSIX-only, so Windows always takes the plain read.
+    if os.name != "nt":
+        try:
+            return faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass  # This faiss build lacks the mmap loader
+    return faiss.read_index(index_path)
+
+
+async def _get_loaded_document(document_id: str) -> dict:
+    """Return a document's chunks and index, loading them from disk if evicted or never loaded."""
+    doc = loaded_documents.get(document_id)
+    if doc is not None:
+        return doc
     
-    if request.document_id not in documents_store:
-        index_path = os.path.join(INDEX_DIR, f"{request.document_id}.index")
-        meta_path = os.path.join(INDEX_DIR, f"{request.document_id}_meta.json")
-        
-        if not os.path.exists(index_path) or not os.path.exists(meta_path):
-            raise HTTPException(status_code=404, detail="Document not found")
+    index_path = os.path.join(INDEX_DIR, f"{document_id}.index")
+    meta_path = os.path.join(INDEX_DIR, f"{document_id}_meta.json")
+    chunks_path = os.path.join(INDEX_DIR, f"{document_id}_chunks.bin")
+    
+    # Checked before taking a lock so unknown ids never leave one behind
+    if not os.path.exists(index_path) or not os.path.exists(meta_path):
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    lock = _load_locks.setdefault(document_id, asyncio.Lock())
+    await lock.acquire()
+    try:
+        doc = loaded_documents.get(document_id)  # Another request may have loaded it while we waited
+        if doc is not None:
+            return doc
         
         try:
-            index = faiss.read_index(index_path)
+            index = await asyncio.to_thread(_read_index, index_path)
             with open(meta_path, 'r', encoding='utf-8') as f:
                 metadata = json.load(f)
-            
+        
             embed_model = metadata.get("embedding_model")
             if not embed_model:
                 raise HTTPException(status_code=500, detail="Document missing embedding_model. Re-upload required.")
+        
+            if os.path.exists(chunks_path):
+                chunks = await asyncio.to_thread(load_chunks, chunks_path)
+            elif "chunks" in metadata:
+                chunks = metadata["chunks"]  # Indexes written before chunks_path existed
+            else:
+                raise HTTPException(status_code=500, detail="Document chunks are missing. Re-upload required.")
             
-            documents_store[request.document_id] = {
-                "chunks": metadata.get("chunks", []),
+            if len(chunks) != index.ntotal:
+                raise HTTPException(status_code=500, detail="Document chunks do not match its index. Re-upload required.")
+        
+            doc = {
+                "chunks": np.asarray(chunks, dtype=object),
                 "index": index,
                 "embedding_model": embed_model
             }
+            loaded_documents[document_id] = doc
+            documents_store.setdefault(document_id, {
+                "file_path": os.path.join(UPLOAD_DIR, f"{document_id}.pdf"),
+                "index_path": index_path,
+                "meta_path": meta_path,
+                "chunks_path": chunks_path,
+                "num_chunks": len(chunks),
+                "embedding_model": embed_model
+            })
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to load document: {e}")
+        
+        return doc
+    finally:
+        lock.release()
+        if _load_locks.get(document_id) is lock:
+            del _load_locks[document_id]
+
+
+@app.post("/chat", response_class=StreamingResponse)
+async def chat(request: ChatRequest):
+    """Chat with uploaded document using RAG, streaming the answer as server-sent events."""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    if not request.provider or request.provider not in ["huggingface", "openai"]:
+        raise HTTPException(status_code=400, detail="Provider must be 'huggingface' or 'openai'")
+    if not request.llm_model or not request.llm_model.strip():
+        raise HTTPException(status_code=400, detail="LLM model is required")
+    if not request.api_key or not request.api_key.strip():
+        raise HTTPException(status_code=400, detail="API key is required")
     
-    doc = documents_store[request.document_id]
+    doc = await _get_loaded_document(request.document_id)
     
     try:
-        relevant_chunks = retrieve(
+        relevant_chunks = await retrieve(
             request.query, doc["index"], doc["chunks"],
             top_k=request.top_k,
             embedding_model=doc["embedding_model"]
@@ -209,18 +289,18 @@ async def chat(request: ChatRequest):
         if not relevant_chunks:
             raise HTTPException(status_code=404, detail="No relevant content found")
         
-        answer = generate_answer(
+        tokens = generate_answer(
             request.query, relevant_chunks,
             provider=request.provider,
             llm_model=request.llm_model,
             api_key=request.api_key
         )
+        # Pull the first token before responding so auth and rate-limit errors still map to HTTP errors
+        first_token = await asyncio.to_thread(next, tokens, None)
         
-        return ChatResponse(
-            answer=answer,
-            sources=relevant_chunks,
-            model_used=request.llm_model,
-            provider=request.provider
+        return StreamingResponse(
+            _stream_chat(relevant_chunks, first_token, tokens, request.llm_model, request.provider),
+            media_type="text/event-stream"
         )
     except HTTPException:
         raise
@@ -235,7 +315,7 @@ async def list_documents():
         {
             "document_id": doc_id,
             "filename": data.get("filename", "Unknown"),
-            "num_chunks": len(data.get("chunks", [])),
+            "num_chunks": data.get("num_chunks", 0),
             "embedding_model": data.get("embedding_model", "Unknown")
         }
         for doc_id, data in documents_store.items()
@@ -248,13 +328,14 @@ async def delete_document(document_id: str):
     if document_id not in documents_store:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    doc = documents_store[document_id]
-    for key in ["file_path", "index_path", "meta_path"]:
+    loaded_documents.pop(document_id, None)  # Release any mapped index before removing its file
+    _load_locks.pop(document_id, None)
+    
+    doc = documents_store.pop(document_id)
+    for key in ["file_path", "index_path", "meta_path", "chunks_path"]:
         path = doc.get(key)
         if path and os.path.exists(path):
             os.remove(path)
-    
-    del documents_store[document_id]
     return {"message": "Document deleted"}
 
 
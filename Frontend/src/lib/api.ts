@@ -108,7 +108,21 @@ export async function uploadDocument(
   });
 }
 
-export async function chat(request: ChatRequest): Promise<ChatResponse> {
+function parseEvent(raw: string): { event: string; data: Record<string, unknown> } {
+  let event = "message";
+  let data = "";
+  for (const line of raw.split("\n")) {
+    if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) data += line.slice(5).trim();
+  }
+  return { event, data: data ? JSON.parse(data) : {} };
+}
+
+// The answer is streamed as server-sent events: sources, token..., then done or error
+export async function chat(
+  request: ChatRequest,
+  onToken?: (token: string) => void
+): Promise<ChatResponse> {
   const response = await fetch(`${API_BASE_URL}/chat`, {
     method: "POST",
     headers: {
@@ -117,12 +131,45 @@ export async function chat(request: ChatRequest): Promise<ChatResponse> {
     body: JSON.stringify(request),
   });
 
-  if (!response.ok) {
+  if (!response.ok || !response.body) {
     const error = await response.json().catch(() => ({ detail: "Chat request failed" }));
     throw new Error(error.detail || "Chat request failed");
   }
 
-  return response.json();
+  const result: ChatResponse = {
+    answer: "",
+    sources: [],
+    model_used: request.llm_model,
+    provider: request.provider,
+  };
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    const events = buffer.split("\n\n");
+    buffer = events.pop() ?? "";
+
+    for (const raw of events) {
+      const { event, data } = parseEvent(raw);
+      if (event === "sources") {
+        result.sources = data.sources as string[];
+      } else if (event === "token") {
+        result.answer += data.text as string;
+        onToken?.(data.text as string);
+      } else if (event === "done") {
+        result.model_used = data.model_used as string;
+        result.provider = data.provider as string;
+      } else if (event === "error") {
+        throw new Error((data.detail as string) || "Chat request failed");
+      }
+    }
+  }
+
+  result.answer = result.answer.trim();
+  return result;
 }
 
 export async function getDocuments(): Promise<DocumentsResponse> {
@@ -145,14 +145,23 @@ export default function ChatInterface() {
     setMessages((prev) => [...prev, typingMessage]);
 
     try {
-      const response = await chat({
-        document_id: selectedDocument.document_id,
-        query,
-        top_k: topK[0],
-        provider,
-        llm_model: model,
-        api_key: apiKey,
-      });
+      let streamed = "";
+      const response = await chat(
+        {
+          document_id: selectedDocument.document_id,
+          query,
+          top_k: topK[0],
+          provider,
+          llm_model: model,
+          api_key: apiKey,
+        },
+        (token) => {
+          streamed += token;
+          setMessages((prev) =>
+            prev.map((m) => (m.id === "typing" ? { ...m, content: streamed.trimStart(), isTyping: false } : m))
+          );
+        }
+      );
 
       const aiResponse: Message = {
         id: (Date.now() + 1).toString(),